@@ -1,72 +1,89 @@
 import os
-import glob
-import scipy
-import pathlib
+import hashlib
 import argparse
+import concurrent.futures
+import importlib.util
 import numpy as np
 import pandas as pd
-import seaborn as sns
-
-import matplotlib
-import matplotlib.pyplot as plt
-
-import scienceplots
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+# Store the strings pandas creates along the way (e.g. by the join) in pyarrow too
+pd.options.mode.string_storage = 'pyarrow'
+
+# The columns of each input file that are used downstream and their types, keyed on the file name (without extension).
+# The text columns are stored as pyarrow strings, so the string operations and the join on them run in pyarrow.
+# The expression values are stored as float32, which is precise enough for the sums and ratios made on them
+EXPRESSION_SCHEMA = (
+    ['gene', 'q_value', 'T1', 'T2', 'significant'],
+    {'gene': 'string[pyarrow]', 'significant': 'string[pyarrow]', 'q_value': 'float32', 'T1': 'float32', 'T2': 'float32'},
+)
+SCHEMA_BY_STEM = {
+    'GO_term_keys': (
+        ['gene', 'name', 'description', 'GO'],
+        {'gene': 'string[pyarrow]', 'name': 'string[pyarrow]', 'description': 'string[pyarrow]', 'GO': 'string[pyarrow]'},
+    ),
+    'expression_phase_I_vs_phase_II': EXPRESSION_SCHEMA,
+    'plastid_expression_phase_I_vs_phase_II': EXPRESSION_SCHEMA,
+    'mito_expression_phase_I_vs_phase_II': EXPRESSION_SCHEMA,
+}
+
+# pandas reads excel files with calamine from version 2.2 on, if python-calamine is installed
+CALAMINE_AVAILABLE = (tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+                      and importlib.util.find_spec('python_calamine') is not None)
+
+# The number of genes whose GO terms are split and summed at a time
+GO_DATA_CHUNK_SIZE = 50_000
 
 def main():
     # Set up the argument parser
     parser = argparse.ArgumentParser()
     parser.add_argument('-p', '--input_path', help='The input directory path containing raw text files to be processed', required=True)
     parser.add_argument('-o', '--output_path', help='The output directory', required=True)
+    parser.add_argument('-d', '--dump_intermediates', help='Save the joined expression dataframe and the GO abundances summary', action='store_true')
+    parser.add_argument('-f', '--format', help='The file format of the saved dataframes', choices=['csv', 'parquet'], default='parquet')
+    parser.add_argument('-r', '--refresh_cache', help='Parse the input files again instead of reading their cached copies', action='store_true')
+    parser.add_argument('-s', '--science_style', help="Plot with the 'science' style of scienceplots", action='store_true')
     
     args = parser.parse_args()
     input_path = os.path.normpath(args.input_path)
     output_path = os.path.normpath(args.output_path)
 
-    # Grab all txt files in the directory
-    files = glob.glob(f"{input_path}/*.xlsx")
+    # Grab all xlsx files in the directory, skipping hidden files and excel's '~$' lock files
+    files = [entry.path for entry in os.scandir(input_path)
+             if entry.is_file() and entry.name.endswith('.xlsx') and not entry.name.startswith(('.', '~$'))]
     
-    organized_files_df = get_files_data_in_dict(files)
+    # The parsed input files are cached in the output directory, so that the next runs do not parse them again
+    cache_dir = create_directory(output_path, '.cache')
+    if args.refresh_cache:
+        clear_cache(cache_dir)
+
+    organized_files_df = get_files_data_in_dict(files, cache_dir)
 
     joined_expression_df = join_expression_df_with_GO_terms(organized_files_df['expression_phase_I_vs_phase_II'], organized_files_df['GO_term_keys'])
     
-    # export the joined dataframe to a csv file
-    joined_expression_df.to_csv(os.path.join(output_path, 'joined_expression_df.csv'), index=False)
+    # export the joined dataframe to a file
+    if args.dump_intermediates:
+        save_df(joined_expression_df, output_path, 'joined_expression_df', args.format)
 
 
     GO_abundace_summary_df = get_GO_data(joined_expression_df)
 
-    # Save the dataframe to a csv file
-    GO_abundace_summary_df.to_csv(os.path.join(output_path, 'summary_go_abundances.csv'), index=False)
+    # Save the dataframe to a file
+    if args.dump_intermediates:
+        save_df(GO_abundace_summary_df, output_path, 'summary_go_abundances', args.format)
         
 
+    # Put the phase I and phase II abundances of each GO term side by side once, for all the plots
+    GO_abundace_wide_df = GO_abundace_summary_df.pivot_table(index=['domain', 'description'], columns='phase', values='abundance').sort_index()
+
     # Create a directory for the plots
     plots_dir = create_directory(output_path, 'plots')
 
-    make_GO_plot('C', ['chloroplast envelope', 'chloroplast inner membrane', 'chloroplast stroma', 'chloroplast thylakoid',
-                       'photosystem I', 'thylakoid lumen', 'thylakoid membrane'], GO_abundace_summary_df, plots_dir,
-                       'Chloroplast', sns.light_palette("seagreen", as_cmap=True))
-    
-
-    make_GO_plot('C', ['mitochondrial inner membrane', 'mitochondrial respiratory chain complex I', 'mitochondrial ribosome'],
-                    GO_abundace_summary_df, plots_dir, 'Mitochondrion', 'Reds')
-    
-    make_GO_plot('C', ['endosome', 'extracellular exosome', 'extrinsic component of membrane','extracellular region'],
-                 GO_abundace_summary_df, plots_dir, 'Endo and Exo cytosis', 'Blues')
-    
-    make_GO_plot('C', ['endomembrane system', 'endoplasmic reticulum', 'endoplasmic reticulum lumen', 
-                       'endoplasmic reticulum membrane', 'cytoskeleton', 'cell cortex', 'myosin complex',
-                        'nuclear envelope', 'nucleoplasm' 'nucleus', 'vacuole'], GO_abundace_summary_df, plots_dir, 'Endomembrane systems', 'Purples')
-        
-    make_GO_plot('C', ['anaphase-promoting complex', 'condensin complex', 'apoplast', 'BRCA1-A complex', 
-                       'cell wall', 'MCM complex', 'microtubule', 'phragmoplast', 'spindle microtubule', 'U7 snRNP', 'nucleolus'], GO_abundace_summary_df, plots_dir,
-                       'Cell cycle and DNA repair', sns.color_palette("flare", as_cmap=True))
-    
-    make_GO_plot('C', ['DNA-directed RNA polymerase II, core complex', 'Elongator holoenzyme complex',
-                       'mRNA cleavage and polyadenylation specificity factor complex', 'signal peptidase complex', 'ribosome',
-                       'small-subunit processome', 'transcription factor TFIID complex'], GO_abundace_summary_df, plots_dir,
-                       'Transcription and translation', sns.diverging_palette(220, 20, as_cmap=True))
+    make_GO_plots(GO_abundace_wide_df, plots_dir, use_science_style=args.science_style)
 
-def get_files_data_in_dict(files):
+def get_files_data_in_dict(files, cache_dir):
     '''
     Description
     -----------
@@ -76,6 +93,8 @@ def get_files_data_in_dict(files):
     ----------
     files : list
         A list of file paths
+    cache_dir : str
+        The path to the directory in which the parsed files are cached
     
     Returns
     -------
@@ -87,27 +106,238 @@ def get_files_data_in_dict(files):
         'plastid_expression_phase_I_vs_phase_II'
         'mito_expression_phase_I_vs_phase_II'
 
-        Each key containing the dataframe of the data from the corresponding file
+        Each key containing the dataframe of the data from the corresponding file.
+        The 'GO_term_keys' dataframe is indexed by its 'gene' column
     '''
-    df_dict = {
-        'GO_term_keys': '', 'expression_phase_I_vs_phase_II': '',
-        'plastid_expression_phase_I_vs_phase_II': '', 'mito_expression_phase_I_vs_phase_II': ''
-    }
-
-    for file in files:
-        file_name = pathlib.Path(file).stem
+    # One key per known input file, None until the file is read
+    df_dict = dict.fromkeys(SCHEMA_BY_STEM, None)
+
+    # The cached files are read here, reading their parquet copies is faster than starting processes
+    # and sending the dataframes back from them
+    files_to_parse = [file for file in files if not is_input_file_cached(file, cache_dir)]
+    files_data = [read_input_file(file, cache_dir) for file in files if file not in files_to_parse]
+
+    # Parse the other files in parallel processes, each file is read independently of the others
+    # and parsing them is mostly python code that would hold the GIL in threads
+    if len(files_to_parse) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=len(files_to_parse)) as executor:
+            files_data.extend(executor.map(read_input_file, files_to_parse, [cache_dir] * len(files_to_parse)))
+    else:
+        files_data.extend(read_input_file(file, cache_dir) for file in files_to_parse)
+
+    for file_name, df in files_data:
         # Check if the file was already read and added to the dictionary
-        if df_dict[file_name] != '':
+        if df_dict[file_name] is not None:
             raise ValueError(f'The file {file_name} was already read, please check the input directory for duplicates')
 
-        # Read the excel file
-        df = pd.read_excel(file)
         # Add the dataframe to the dictionary
         df_dict[file_name] = df
 
     return df_dict
 
 
+def is_input_file_cached(file, cache_dir):
+    '''
+    Description
+    -----------
+    Check if one of the input files already has a cached copy
+
+    Parameters
+    ----------
+    file : str
+        The path to the file. Its name (without extension) must be one of the keys of SCHEMA_BY_STEM
+    cache_dir : str
+        The path to the directory in which the parsed file is cached
+
+    Returns
+    -------
+    is_cached : bool
+        Whether the cache file of the file exists
+    '''
+    file_name = os.path.splitext(os.path.basename(file))[0]
+    usecols, dtype = SCHEMA_BY_STEM[file_name]
+
+    return os.path.exists(get_cache_file(file, cache_dir, usecols=usecols, dtype=dtype))
+
+
+def read_input_file(file, cache_dir):
+    '''
+    Description
+    -----------
+    Read one of the input files into a dataframe
+
+    Parameters
+    ----------
+    file : str
+        The path to the file. Its name (without extension) must be one of the keys of SCHEMA_BY_STEM
+    cache_dir : str
+        The path to the directory in which the parsed file is cached
+
+    Returns
+    -------
+    file_name : str
+        The name of the file, without extension
+    df : pandas.DataFrame
+        The dataframe of the data from the file. The 'GO_term_keys' dataframe is indexed by its 'gene' column
+    '''
+    file_name = os.path.splitext(os.path.basename(file))[0]
+    usecols, dtype = SCHEMA_BY_STEM[file_name]
+
+    # Read the excel file, or its cached copy if it was already read in a previous run
+    # Only the needed columns are read, and their types are given up front to skip type inference
+    df = read_excel_with_cache(file, cache_dir, usecols=usecols, dtype=dtype)
+    # Index the GO terms by gene, so that the expression data can be joined onto them
+    if file_name == 'GO_term_keys':
+        df = df.set_index('gene')
+
+    return file_name, df
+
+
+def read_excel_with_cache(file, cache_dir, usecols=None, dtype=None):
+    '''
+    Description
+    -----------
+    Read an excel file into a dataframe, caching it as a parquet file.
+    The cache file is named after a hash of the path, modification time and size of the excel file
+    and of the columns and types read from it, so editing the excel file or the columns invalidates its cache
+
+    Parameters
+    ----------
+    file : str
+        The path to the excel file
+    cache_dir : str
+        The path to the directory of the cache files
+    usecols : list of str, optional
+        The columns to read, columns that are not in the file are ignored. By default all columns are read
+    dtype : dict, optional
+        The types of the columns
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The dataframe of the data from the file
+    '''
+    cache_file = get_cache_file(file, cache_dir, usecols=usecols, dtype=dtype)
+    if os.path.exists(cache_file):
+        return pd.read_parquet(cache_file, engine='pyarrow')
+
+    column_filter = None if usecols is None else (lambda column: column in usecols)
+
+    # Read the first sheet with calamine, which parses the file in native code, if it is available.
+    # Otherwise stream the sheet with openpyxl
+    if CALAMINE_AVAILABLE:
+        df = pd.read_excel(file, engine='calamine', sheet_name=0, usecols=column_filter, dtype=dtype)
+    else:
+        df = read_excel_sheet(file, usecols=column_filter, dtype=dtype)
+
+    # Columns that mix types can not be stored in parquet,
+    # in which case the excel file is simply read again in the next run
+    # The cache is written to a temporary file first, so that an interrupted write never leaves a broken cache file
+    temp_cache_file = f'{cache_file}.tmp'
+    try:
+        df.to_parquet(temp_cache_file, engine='pyarrow', compression='zstd')
+        os.replace(temp_cache_file, cache_file)
+    except (ImportError, TypeError, ValueError):
+        if os.path.exists(temp_cache_file):
+            os.remove(temp_cache_file)
+
+    return df
+
+
+def get_cache_file(file, cache_dir, usecols=None, dtype=None):
+    '''
+    Description
+    -----------
+    Get the path of the cache file of an excel file, see read_excel_with_cache
+
+    Parameters
+    ----------
+    file : str
+        The path to the excel file
+    cache_dir : str
+        The path to the directory of the cache files
+    usecols : list of str, optional
+        The columns read from the file
+    dtype : dict, optional
+        The types of the columns
+
+    Returns
+    -------
+    cache_file : str
+        The path to the cache file, which may not exist yet
+    '''
+    file_stat = os.stat(file)
+    cache_key = hashlib.blake2b(f'{os.path.abspath(file)}:{file_stat.st_mtime}:{file_stat.st_size}:{usecols}:{dtype}'.encode(),
+                                digest_size=16).hexdigest()
+
+    return os.path.join(cache_dir, f'{cache_key}.parquet')
+
+
+def clear_cache(cache_dir):
+    '''
+    Description
+    -----------
+    Delete the cached copies of the input files, and the temporary files left by interrupted cache writes
+
+    Parameters
+    ----------
+    cache_dir : str
+        The path to the directory of the cache files
+    '''
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and entry.name.endswith(('.parquet', '.parquet.tmp')):
+            os.remove(entry.path)
+
+
+def read_excel_sheet(file, usecols=None, dtype=None):
+    '''
+    Description
+    -----------
+    Read the first sheet of an excel file into a dataframe.
+    The rows are streamed from openpyxl's read-only workbook straight into the dataframe,
+    which skips the parsing pandas.read_excel does on top of openpyxl
+
+    Parameters
+    ----------
+    file : str
+        The path to the excel file
+    usecols : callable, optional
+        A function that is given each column name and returns whether to keep the column. By default all columns are kept
+    dtype : dict, optional
+        The types of the columns, columns that are not in the sheet are ignored
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        The dataframe of the data from the sheet, the first row being the column names
+    '''
+    # openpyxl is only imported when it is used, calamine reads and cache hits do not need it
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        # The dimensions stored in the file may be wrong, so let openpyxl find them while reading
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, ())
+        df = pd.DataFrame.from_records(rows, columns=header)
+    finally:
+        # Release the handle of the file
+        workbook.close()
+
+    # Drop the empty rows that excel sometimes leaves at the end of the sheet
+    df = df.dropna(how='all')
+    df = df.reset_index(drop=True)
+
+    if usecols is not None:
+        df = df[[column for column in df.columns if usecols(column)]]
+    if dtype is not None:
+        df = df.astype({column: column_type for column, column_type in dtype.items() if column in df.columns})
+
+    return df
+
+
 def join_expression_df_with_GO_terms(expression_df, go_term_df):
     '''
     Description
@@ -119,7 +349,7 @@ def join_expression_df_with_GO_terms(expression_df, go_term_df):
     expression_df : pandas.DataFrame
         The expression dataframe. Must contain a column named 'gene'
     go_term_df : pandas.DataFrame
-        The GO term dataframe. Must contain a column named 'gene'
+        The GO term dataframe. Must be indexed by 'gene'
 
     Returns
     -------
@@ -131,39 +361,66 @@ def join_expression_df_with_GO_terms(expression_df, go_term_df):
     # Check if the expression dataframe contains a column named 'gene'
     if 'gene' not in list(expression_df.columns):
         raise ValueError('The expression dataframe must contain a column named "gene"')
-    # Check if the GO term dataframe contains a column named 'gene'
-    if 'gene' not in list(go_term_df.columns):
-        raise ValueError('The GO term dataframe must contain a column named "gene"')
+    # Check if the GO term dataframe is indexed by 'gene'
+    if go_term_df.index.name != 'gene':
+        raise ValueError('The GO term dataframe must be indexed by "gene"')
     
-    # If expression_df contains a name column, drop it
-    if 'name' in expression_df.columns:
-        expression_df = expression_df.drop(columns=['name'])
-
-    # Drop the 'significant' column from expression_df
-    expression_df = expression_df.drop(columns=['significant'])
-
-    # Drop rows where q_value is NaN or grate than 0.05
-    expression_df = expression_df.dropna(subset=['q_value'])
-    expression_df = expression_df[expression_df['q_value'] <= 0.05]
-
-    # Drop rows where either T1 or T2 is NaN or 0
-    expression_df = expression_df.dropna(subset=['T1', 'T2'])
-    expression_df = expression_df[(expression_df['T1'] != 0) & (expression_df['T2'] != 0)]
+    # float32 is precise enough for the sums and ratios made on the expression values, and is half the size to filter.
+    # The expression files are already read as float32, in which case this does not copy anything
+    q_value = expression_df['q_value'].to_numpy(dtype=np.float32)
+    t1 = expression_df['T1'].to_numpy(dtype=np.float32)
+    t2 = expression_df['T2'].to_numpy(dtype=np.float32)
+
+    # Drop rows where q_value is NaN or grate than 0.05,
+    # and rows where either T1 or T2 is NaN or 0, all in a single pass (NaN != NaN)
+    mask = (q_value == q_value) & (q_value <= 0.05) & (t1 == t1) & (t2 == t2) & (t1 != 0) & (t2 != 0)
+
+    # Take the rows that passed, without the 'name' and 'significant' columns, in a single copy
+    kept_columns = [column for column in expression_df.columns if column not in ('name', 'significant')]
+    expression_df = expression_df.loc[mask, kept_columns].astype({'T1': 'float32', 'T2': 'float32', 'q_value': 'float32'})
+
+    # remove the text after '.' in the gene column, splitting the genes once in pyarrow
+    gene_prefixes = pc.list_element(pc.split_pattern(pa.array(expression_df['gene']), '.', max_splits=1), 0)
+    expression_df['gene'] = pd.Series(gene_prefixes, index=expression_df.index, dtype='string[pyarrow]')
+
+    # Drop the GO term rows where GO is 0 (read as the string '0') or name is '---NA---' before the join,
+    # keeping only the columns that are joined
+    go_term_df = go_term_df.loc[~go_term_df['GO'].isin(['0']) & ~go_term_df['name'].isin(['---NA---']), ['name', 'description', 'GO']]
+    # Keep a single row per gene, so that the join is made on a unique index
+    go_term_df = go_term_df.loc[~go_term_df.index.duplicated()]
+    
+    # Join the two dataframes, genes without GO terms are dropped
+    expression_df = expression_df.join(go_term_df, on='gene', how='inner')
 
-    # remove the text after '.' in the gene column
-    expression_df['gene'] = expression_df['gene'].str.split('.').str[0]
+    return expression_df
     
-    # Join the two dataframes
-    expression_df = expression_df.merge(go_term_df, on='gene', how='left')
 
-    # Drop rows where GO is 0
-    expression_df = expression_df[expression_df['GO'] != 0]
+def save_df(df, output_path, file_name, file_format):
+    '''
+    Description
+    -----------
+    Save a dataframe to a file, without its index
 
-    # Drop rows where name is '---NA---'
-    expression_df = expression_df[expression_df['name'] != '---NA---']
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The dataframe to save
+    output_path : str
+        The path to the directory in which the file will be saved
+    file_name : str
+        The name of the file, without extension
+    file_format : str
+        The file format, 'csv' or 'parquet'
+    '''
+    file_path = os.path.join(output_path, f'{file_name}.{file_format}')
+    if file_format == 'csv':
+        # pyarrow formats the values in C rather than cell by cell in python
+        pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), file_path)
+    elif file_format == 'parquet':
+        df.to_parquet(file_path, index=False, compression='zstd')
+    else:
+        raise ValueError(f'Unexpected file format: {file_format}')
 
-    return expression_df
-    
 
 def create_directory(parent_directory, nested_directory_name):
     '''
@@ -181,8 +438,7 @@ def create_directory(parent_directory, nested_directory_name):
     # Create the output directory path
     new_dir_path = os.path.join(parent_directory, nested_directory_name)
     # Create the directory if it does not exist
-    if not os.path.isdir(new_dir_path):
-        os.mkdir(new_dir_path)
+    os.makedirs(new_dir_path, exist_ok=True)
     return new_dir_path
 
 
@@ -205,84 +461,123 @@ def get_GO_data(joined_expression_df):
         description : The description of the GO term
         abundance : The abundance of the GO term - sum of all reads (in rpkm) that fell under the GO term
     '''
+    # Sum the abundances over chunks of genes, so that only one chunk of genes is split into its GO terms at a time,
+    # then add up the sums of the chunks
+    chunks_abundances_dfs = [
+        get_chunk_GO_data(joined_expression_df.iloc[start:start + GO_DATA_CHUNK_SIZE])
+        for start in range(0, max(len(joined_expression_df), 1), GO_DATA_CHUNK_SIZE)
+    ]
+    abundances_df = pd.concat(chunks_abundances_dfs).groupby(['domain', 'description'], sort=False)[['I', 'II']].sum().reset_index()
+
+    # Put the abundances in a long dataframe, one row per phase
+    abundances_df = abundances_df.melt(id_vars=['domain', 'description'], value_vars=['I', 'II'],
+                                       var_name='phase', value_name='abundance')
+
+    return abundances_df[['phase', 'domain', 'description', 'abundance']]
+
+
+def get_chunk_GO_data(chunk_df):
+    '''
+    Description
+    -----------
+    Get the GO data of a chunk of the joined dataframe
+
+    Parameters
+    ----------
+    chunk_df : pandas.DataFrame
+        A chunk of rows of the joined dataframe
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        A dataframe containing the GO data of the chunk with the following columns:
+        domain : The domain of the GO term (C, P, F)
+        description : The description of the GO term
+        I : The abundance of the GO term in phase I - sum of all reads (in rpkm) that fell under the GO term
+        II : The abundance of the GO term in phase II
+    '''
+    # Split every GO string into its individual terms, one term per row.
+    # The index is reset so that each term can be traced back to the position of its gene
+    go_terms = chunk_df['GO'].str.split(';').reset_index(drop=True).explode()
+    gene_positions = go_terms.index.to_numpy()
+
+    # Give every distinct GO term an integer code (missing GO strings get -1),
+    # so that the abundances are summed over the codes instead of over the strings
+    go_terms_codes, unique_go_terms = pd.factorize(go_terms.str.strip())
+
     # In a GO string, the first letter represents the ontology (C, P, F)
     # C - cellular component
-    cellular_component_phase_I_keys_and_proportion = {}
-    cellular_component_phase_II_keys_and_proportion = {}
     # P - biological process
-    biological_process_phase_I_keys_and_proportion = {}
-    biological_process_phase_II_keys_and_proportion = {}
     # F - molecular function
-    molecular_function_phase_I_keys_and_proportion = {}
-    molecular_function_phase_II_keys_and_proportion = {}
-
-    # Make the abundance calculation using dictionaries for efficiency
-    for index ,row in joined_expression_df.iterrows():
-        expression_in_phae_I = row['T1']
-        expression_in_phae_II = row['T2']
-
-        for go_term_inner_item in row['GO'].split(";"):
-            go_term_inner_item = go_term_inner_item.strip().split(":")
-            go_term_inner_item_key = go_term_inner_item[0]
-            go_term_inner_item_value = go_term_inner_item[1]
-
-            if go_term_inner_item_key == 'C':
-                if go_term_inner_item_value not in cellular_component_phase_I_keys_and_proportion.keys():
-                    cellular_component_phase_I_keys_and_proportion[go_term_inner_item_value] = expression_in_phae_I
-                    cellular_component_phase_II_keys_and_proportion[go_term_inner_item_value] = expression_in_phae_II
-                else:
-                    cellular_component_phase_I_keys_and_proportion[go_term_inner_item_value] += expression_in_phae_I
-                    cellular_component_phase_II_keys_and_proportion[go_term_inner_item_value] += expression_in_phae_II
-            elif go_term_inner_item_key == 'P':
-                if go_term_inner_item_value not in biological_process_phase_I_keys_and_proportion.keys():
-                    biological_process_phase_I_keys_and_proportion[go_term_inner_item_value] = expression_in_phae_I
-                    biological_process_phase_II_keys_and_proportion[go_term_inner_item_value] = expression_in_phae_II
-                else:
-                    biological_process_phase_I_keys_and_proportion[go_term_inner_item_value] += expression_in_phae_I
-                    biological_process_phase_II_keys_and_proportion[go_term_inner_item_value] += expression_in_phae_II
-            elif go_term_inner_item_key == 'F':
-                if go_term_inner_item_value not in molecular_function_phase_I_keys_and_proportion.keys():
-                    molecular_function_phase_I_keys_and_proportion[go_term_inner_item_value] = expression_in_phae_I
-                    molecular_function_phase_II_keys_and_proportion[go_term_inner_item_value] = expression_in_phae_II
-                else:
-                    molecular_function_phase_I_keys_and_proportion[go_term_inner_item_value] += expression_in_phae_I
-                    molecular_function_phase_II_keys_and_proportion[go_term_inner_item_value] += expression_in_phae_II
-            else:
-                raise ValueError(f'Unexpected GO term key in: {row["GO"]} at row {index}')
-            
-    
-    # Put the contents of the dictionaries in a dataframe
-    phases = []
-    domains = []
-    descriptions = []
-    abundances = []
-
-    domains_letters = ['C', 'C', 'P', 'P', 'F', 'F']
-    phases_letters = ['I', 'II', 'I', 'II', 'I', 'II']
-    for index, dict in enumerate([
-                    cellular_component_phase_I_keys_and_proportion, cellular_component_phase_II_keys_and_proportion,
-                    biological_process_phase_I_keys_and_proportion, biological_process_phase_II_keys_and_proportion,
-                    molecular_function_phase_I_keys_and_proportion, molecular_function_phase_II_keys_and_proportion,
-                ]):
-        curr_domain = domains_letters[index]
-        curr_phase = phases_letters[index]
-        for key, value in dict.items():
-            phases.append(curr_phase)
-            domains.append(curr_domain)
-            descriptions.append(key)
-            abundances.append(value)
-
-
-    # Create a dataframe from the lists
+    # Only the distinct GO terms have to be split into their key and value
+    go_terms_keys_and_values = pd.Series(unique_go_terms, dtype=object).str.split(':', n=1, expand=True).reindex(columns=[0, 1])
+
+    # A GO term is expected to have one of the known keys and a description after its ':'.
+    # The extra False at the end is picked up by the -1 code of missing GO strings
+    expected_keys = np.append((go_terms_keys_and_values[0].isin(['C', 'P', 'F'])
+                               & go_terms_keys_and_values[1].notna()).to_numpy(), False)
+    unexpected_keys = ~expected_keys[go_terms_codes]
+    if unexpected_keys.any():
+        index = chunk_df.index[gene_positions[unexpected_keys][0]]
+        raise ValueError(f'Unexpected GO term key in: {chunk_df.loc[index, "GO"]} at row {index}')
+
+    # Sum the expression of all genes that fell under each GO term, for each phase
     return pd.DataFrame({
-        'phase': phases,
-        'domain': domains,
-        'description': descriptions,
-        'abundance': abundances
+        'domain': go_terms_keys_and_values[0].to_numpy(),
+        'description': go_terms_keys_and_values[1].to_numpy(),
+        'I': np.bincount(go_terms_codes, weights=chunk_df['T1'].to_numpy()[gene_positions], minlength=len(unique_go_terms)),
+        'II': np.bincount(go_terms_codes, weights=chunk_df['T2'].to_numpy()[gene_positions], minlength=len(unique_go_terms)),
     })
 
 
-def make_GO_plot(domain, descriptions, GO_abundace_summary_df, plots_dir, save_name, colormap_for_plot):
+def make_GO_plots(GO_abundace_wide_df, plots_dir, use_science_style=False):
+    '''
+    Description
+    -----------
+    Make the plots of the cellular component GO terms of each group of organelles and processes
+
+    Parameters
+    ----------
+    GO_abundace_wide_df : pandas.DataFrame
+        A dataframe containing the GO data, see make_GO_plot
+    plots_dir : str
+        The path to the plots directory
+    use_science_style : bool, optional
+        Whether to plot with the 'science' style of scienceplots
+
+    Returns
+    -------
+    None
+    '''
+    # seaborn is only imported when plotting, it is not needed to read and process the data
+    import seaborn as sns
+
+    make_GO_plot('C', ['chloroplast envelope', 'chloroplast inner membrane', 'chloroplast stroma', 'chloroplast thylakoid',
+                       'photosystem I', 'thylakoid lumen', 'thylakoid membrane'], GO_abundace_wide_df, plots_dir,
+                       'Chloroplast', sns.light_palette("seagreen", as_cmap=True), use_science_style=use_science_style)
+    
+
+    make_GO_plot('C', ['mitochondrial inner membrane', 'mitochondrial respiratory chain complex I', 'mitochondrial ribosome'],
+                    GO_abundace_wide_df, plots_dir, 'Mitochondrion', 'Reds', use_science_style=use_science_style)
+    
+    make_GO_plot('C', ['endosome', 'extracellular exosome', 'extrinsic component of membrane','extracellular region'],
+                 GO_abundace_wide_df, plots_dir, 'Endo and Exo cytosis', 'Blues', use_science_style=use_science_style)
+    
+    make_GO_plot('C', ['endomembrane system', 'endoplasmic reticulum', 'endoplasmic reticulum lumen', 
+                       'endoplasmic reticulum membrane', 'cytoskeleton', 'cell cortex', 'myosin complex',
+                        'nuclear envelope', 'nucleoplasm', 'nucleus', 'vacuole'], GO_abundace_wide_df, plots_dir, 'Endomembrane systems', 'Purples', use_science_style=use_science_style)
+        
+    make_GO_plot('C', ['anaphase-promoting complex', 'condensin complex', 'apoplast', 'BRCA1-A complex', 
+                       'cell wall', 'MCM complex', 'microtubule', 'phragmoplast', 'spindle microtubule', 'U7 snRNP', 'nucleolus'], GO_abundace_wide_df, plots_dir,
+                       'Cell cycle and DNA repair', sns.color_palette("flare", as_cmap=True), use_science_style=use_science_style)
+    
+    make_GO_plot('C', ['DNA-directed RNA polymerase II, core complex', 'Elongator holoenzyme complex',
+                       'mRNA cleavage and polyadenylation specificity factor complex', 'signal peptidase complex', 'ribosome',
+                       'small-subunit processome', 'transcription factor TFIID complex'], GO_abundace_wide_df, plots_dir,
+                       'Transcription and translation', sns.diverging_palette(220, 20, as_cmap=True), use_science_style=use_science_style)
+
+
+def make_GO_plot(domain, descriptions, GO_abundace_wide_df, plots_dir, save_name, colormap_for_plot, use_science_style=False):
     '''
     Description
     -----------
@@ -294,52 +589,67 @@ def make_GO_plot(domain, descriptions, GO_abundace_summary_df, plots_dir, save_n
         The domain of the GO term (C, P, F)
     descriptions : list of str
         A list of GO term descriptions
-    GO_abundace_summary_df : pandas.DataFrame
-        A dataframe containing the GO data with the following columns:
-        phase : The phase of the gene expression
+    GO_abundace_wide_df : pandas.DataFrame
+        A dataframe containing the GO data, indexed by:
         domain : The domain of the GO term (C, P, F)
         description : The description of the GO term
-        abundance : The abundance of the GO term - sum of all reads (in rpkm) that fell under the GO term
+        with the following columns:
+        I : The abundance of the GO term in phase I - sum of all reads (in rpkm) that fell under the GO term
+        II : The abundance of the GO term in phase II
     plots_dir : str
         The path to the plots directory
+    use_science_style : bool, optional
+        Whether to plot with the 'science' style of scienceplots
     
     Returns
     -------
     None
     '''
-    domain_data = GO_abundace_summary_df.loc[(GO_abundace_summary_df['domain'] == domain)]
-    phase_I_data = domain_data.loc[((domain_data['phase'] == 'I') & (domain_data['description'].isin(descriptions)))]
-    phase_II_data = domain_data.loc[((domain_data['phase'] == 'II') & (domain_data['description'].isin(descriptions)))]
-
-    joined_df = phase_I_data.merge(phase_II_data, on='description', how='left', suffixes=('_I', '_II'))
-    joined_df = joined_df.drop(columns=['domain_I', 'domain_II', 'phase_I', 'phase_II'])
-    joined_df = joined_df.rename(columns={'description': 'description', 'abundance_I': 'abundance_phase_I', 'abundance_II': 'abundance_phase_II'}) 
-    joined_df['log2_ratio_phaseII_over_phaseI'] = np.log2(joined_df['abundance_phase_II'] / joined_df['abundance_phase_I'])
+    # Look up the requested GO terms, skipping those that are not in the data
+    requested_index = pd.MultiIndex.from_product([[domain], descriptions], names=['domain', 'description'])
+    joined_df = GO_abundace_wide_df.reindex(requested_index).dropna().droplevel('domain').reset_index()
+    joined_df = joined_df.rename(columns={'I': 'abundance_phase_I', 'II': 'abundance_phase_II'})
+    joined_df['log2_ratio_phaseII_over_phaseI'] = np.log2(joined_df['abundance_phase_II'].to_numpy()) - np.log2(joined_df['abundance_phase_I'].to_numpy())
     joined_df = joined_df.sort_values(by=['log2_ratio_phaseII_over_phaseI'], ascending=False)
 
 
+    # matplotlib is only imported when plotting, it is not needed to read and process the data.
+    # The plots are only saved to files, so use the non-interactive backend
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
     # Plot the data
-    colormap = colormap_for_plot
+    if use_science_style:
+        # Importing scienceplots registers its styles, which is only worth it if they are used
+        import scienceplots
 
-    # Normalize values to map to the colormap
-    norm = plt.Normalize(joined_df['log2_ratio_phaseII_over_phaseI'].min(), joined_df['log2_ratio_phaseII_over_phaseI'].max())
+    # The style is only applied within the context, so it does not carry over to the next plots
+    with plt.style.context(['science'] if use_science_style else []):
+        colormap = colormap_for_plot
 
-    # Create a colorbar scalar map
-    colors = plt.cm.ScalarMappable(norm=norm, cmap=colormap)
+        # Normalize values to map to the colormap
+        norm = plt.Normalize(joined_df['log2_ratio_phaseII_over_phaseI'].min(), joined_df['log2_ratio_phaseII_over_phaseI'].max())
 
-    fig, ax = plt.subplots(figsize=(10, 10))
-    description_for_sidp =  joined_df['description'].str.replace(' ', '\n')
-    bars = ax.bar(description_for_sidp, joined_df['log2_ratio_phaseII_over_phaseI'], color=colors.to_rgba(joined_df['log2_ratio_phaseII_over_phaseI']), edgecolor='black', linewidth=1)
+        # Create a colorbar scalar map
+        colors = plt.cm.ScalarMappable(norm=norm, cmap=colormap)
 
-    ax.axline((0, 0), slope=0, color='black', linewidth=1)
+        fig, ax = plt.subplots(figsize=(10, 10))
+        description_for_sidp =  joined_df['description'].str.replace(' ', '\n')
+        bars = ax.bar(description_for_sidp, joined_df['log2_ratio_phaseII_over_phaseI'], color=colors.to_rgba(joined_df['log2_ratio_phaseII_over_phaseI']), edgecolor='black', linewidth=1)
 
-    ax.set_title(r'$log_2$' + r'$(\frac{T2}{T1})$' + f' for {save_name} GO terms', fontsize=20)
-    ax.set_xlabel('GO term', fontsize=16)
-    ax.set_ylabel(r'$log_2$' + r'$(\frac{T2}{T1})$', fontsize=16)
+        ax.axline((0, 0), slope=0, color='black', linewidth=1)
 
-    plt.tight_layout()
-    
-    plt.savefig(os.path.join(plots_dir, f'log2_ratio_of_phase_II_over_phase_I_for_{save_name}_GO_terms.png'))
+        ax.set_title(r'$log_2$' + r'$(\frac{T2}{T1})$' + f' for {save_name} GO terms', fontsize=20)
+        ax.set_xlabel('GO term', fontsize=16)
+        ax.set_ylabel(r'$log_2$' + r'$(\frac{T2}{T1})$', fontsize=16)
+
+        fig.tight_layout()
+
+        fig.savefig(os.path.join(plots_dir, f'log2_ratio_of_phase_II_over_phase_I_for_{save_name}_GO_terms.png'))
+
+    # Free the figure, it is not needed once saved
+    plt.close(fig)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file